@@ -1 +1 @@
-from . import chat, images  # noqa: F401
+from . import chat, client, images  # noqa: F401
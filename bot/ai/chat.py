@@ -1,16 +1,34 @@
 """ChatGPT (GPT-3.5+) language model from OpenAI."""
 
+import asyncio
+import functools
+import itertools
 import logging
+import re
+import time
 from typing import Optional
 
-from openai import AsyncOpenAI
-
+from bot.ai.client import openai
 from bot.config import config
 
-openai = AsyncOpenAI(api_key=config.openai.api_key, base_url=config.openai.url)
-
 logger = logging.getLogger(__name__)
 
+word_re = re.compile(r"\S+")
+# Matches the version date at the end of a model name, e.g. -0613 or -2024-08-06
+date_re = re.compile(r"-\d{4}(?:-\d{2}-\d{2})?$")
+
+# Only strings up to this many characters have their token counts cached
+TOKENS_CACHE_MAX_LEN = 1000
+
+# How long to wait for the connection warmup, in seconds
+WARMUP_TIMEOUT = 3
+# How often to warm up the connection at most, in seconds.
+# Well within the keep-alive expiry, so a recently used connection is still open.
+WARMUP_INTERVAL = 30
+
+# The last time the connection was used, as per time.monotonic()
+last_used: Optional[float] = None
+
 # Supported models and their context windows
 MODELS = {
     # Gemini
@@ -89,7 +107,9 @@ class Model:
 
         n_input = _calc_n_input(model, n_output=config.openai.params["max_tokens"])
         messages = self._generate_messages(prompt_role, prompt, question, history)
-        messages = shorten(messages, length=n_input)
+        lengths = [_calc_tokens(m["content"]) for m in messages]
+        logger.debug("n_input=%s, n_tokens=%s", n_input, sum(lengths))
+        messages = shorten(messages, length=n_input, lengths=lengths)
 
         params = params_func(config.openai.params)
         logger.debug(
@@ -103,9 +123,13 @@ class Model:
             messages=messages,
             **params,
         )
+        _mark_used()
+        details = resp.usage.prompt_tokens_details
         logger.debug(
-            "< chat response: prompt_tokens=%s, completion_tokens=%s, total_tokens=%s",
+            "< chat response: prompt_tokens=%s, cached_tokens=%s, "
+            "completion_tokens=%s, total_tokens=%s",
             resp.usage.prompt_tokens,
+            details.cached_tokens if details else None,
             resp.usage.completion_tokens,
             resp.usage.total_tokens,
         )
@@ -119,7 +143,13 @@ class Model:
         question: str,
         history: list[tuple[str, str]],
     ) -> list[dict]:
-        """Builds message history to provide context for the language model."""
+        """
+        Builds message history to provide context for the language model.
+        The prompt goes first and the history follows from oldest to newest,
+        so consecutive requests share a byte-identical prefix
+        and benefit from the provider's prompt caching.
+        Do not put per-request data (dates, usernames) into the prompt.
+        """
         messages = [{"role": prompt_role, "content": prompt or config.openai.prompt}]
         for prev_question, prev_answer in history:
             messages.append({"role": "user", "content": prev_question})
@@ -138,16 +168,33 @@ class Model:
 
 
 def _calc_tokens(s: str) -> int:
-    """Calculates the number of tokens in a string."""
+    """
+    Calculates the number of tokens in a string.
+    Short strings are cached, since history messages are re-counted on every question.
+    Longer ones (fetched pages, documents) are not, so the cache does not keep them alive.
+    """
+    if len(s) > TOKENS_CACHE_MAX_LEN:
+        return _count_tokens(s)
+    return _count_tokens_cached(s)
+
+
+def _count_tokens(s: str) -> int:
     return int(len(s.split()) * 1.2)
 
 
-def shorten(messages: list[dict], length: int) -> list[dict]:
+_count_tokens_cached = functools.lru_cache(maxsize=1024)(_count_tokens)
+
+
+def shorten(
+    messages: list[dict], length: int, lengths: Optional[list[int]] = None
+) -> list[dict]:
     """
     Truncates messages so that the total number or tokens
     does not exceed the specified length.
+    Token counts can be passed in `lengths` if the caller has already calculated them.
     """
-    lengths = [_calc_tokens(m["content"]) for m in messages]
+    if lengths is None:
+        lengths = [_calc_tokens(m["content"]) for m in messages]
     total_len = sum(lengths)
     if total_len <= length:
         return messages
@@ -166,12 +213,42 @@ def shorten(messages: list[dict], length: int) -> list[dict]:
 
     # there is only one message left, and it's still longer than allowed
     # so we have to shorten it
-    maxlen = length - prompt_len
-    tokens = messages[1]["content"].split()[:maxlen]
-    messages[1]["content"] = " ".join(tokens)
+    maxlen = max(length - prompt_len, 0)
+    messages[1]["content"] = _truncate(messages[1]["content"], maxlen)
     return messages
 
 
+def _truncate(s: str, maxlen: int) -> str:
+    """
+    Keeps the first `maxlen` tokens of a string.
+    Scans only the beginning of the string instead of splitting it whole.
+    """
+    words = itertools.islice(word_re.finditer(s), maxlen)
+    return " ".join(match.group(0) for match in words)
+
+
+async def warmup() -> None:
+    """
+    Opens a connection to the AI provider in advance,
+    so that the following request does not wait for the handshake.
+    Does nothing if the connection has been used recently.
+    """
+    if last_used is not None and time.monotonic() - last_used < WARMUP_INTERVAL:
+        return
+    _mark_used()
+    try:
+        client = openai.with_options(max_retries=0)
+        await asyncio.wait_for(client.models.list(), timeout=WARMUP_TIMEOUT)
+    except Exception as exc:
+        logger.debug("warmup failed: %s", exc)
+
+
+def _mark_used() -> None:
+    """Remembers that the connection to the AI provider is open."""
+    global last_used
+    last_used = time.monotonic()
+
+
 def _calc_n_input(name: str, n_output: int) -> int:
     """
     Calculates the maximum number of input tokens
@@ -179,6 +256,19 @@ def _calc_n_input(name: str, n_output: int) -> int:
     """
     # OpenAI counts length in tokens, not characters.
     # We need to leave some tokens reserved for the output.
-    n_total = MODELS.get(name) or config.openai.window
+    n_total = _find_window(name) or config.openai.window
     logger.debug("model=%s, n_total=%s, n_output=%s", name, n_total, n_output)
     return n_total - n_output
+
+
+@functools.lru_cache(maxsize=64)
+def _find_window(name: str) -> Optional[int]:
+    """
+    Returns the context window of a known model, including its dated versions
+    (e.g. gpt-4o-2024-08-06 has the same window as gpt-4o).
+    """
+    if name in MODELS:
+        return MODELS[name]
+    # only a date suffix is stripped, since other suffixes
+    # (e.g. gpt-4-1106-preview) may change the window
+    return MODELS.get(date_re.sub("", name))
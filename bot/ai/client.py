@@ -0,0 +1,27 @@
+"""OpenAI API client shared by all the models."""
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from bot.config import config
+
+# Keep idle connections open longer than the httpx default (5 seconds),
+# so that the warmed up connection survives until the next question.
+KEEPALIVE_EXPIRY = 60
+
+openai = AsyncOpenAI(
+    api_key=config.openai.api_key,
+    base_url=config.openai.url,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=1000,
+            max_keepalive_connections=100,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+    ),
+)
+
+
+async def close() -> None:
+    """Closes the underlying connection pool."""
+    await openai.close()
@@ -1,11 +1,8 @@
 """DALL-E model from OpenAI."""
 
-from openai import AsyncOpenAI
-
+from bot.ai.client import openai
 from bot.config import config
 
-openai = AsyncOpenAI(api_key=config.openai.api_key, base_url=config.openai.url)
-
 
 class Model:
     """OpenAI DALL-E wrapper."""
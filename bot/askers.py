@@ -3,7 +3,6 @@ Asker is an abstraction that sends questions to the AI
 and responds to the user with answers provided by the AI.
 """
 
-import io
 import re
 import textwrap
 
@@ -40,12 +39,14 @@ class TextAsker(Asker):
 
     async def reply(self, message: Message, context: CallbackContext, answer: str) -> None:
         """Replies with an answer from AI."""
-        html_answer = markdown.to_html(answer)
-        if len(html_answer) <= MessageLimit.MAX_TEXT_LENGTH:
-            await message.reply_text(html_answer, parse_mode=ParseMode.HTML)
-            return
+        # HTML markup never gets this much shorter than the original text,
+        # so there is no point in rendering answers that are way too long
+        if len(answer) <= 2 * MessageLimit.MAX_TEXT_LENGTH:
+            html_answer = markdown.to_html(answer)
+            if len(html_answer) <= MessageLimit.MAX_TEXT_LENGTH:
+                await message.reply_text(html_answer, parse_mode=ParseMode.HTML)
+                return
 
-        doc = io.StringIO(answer)
         caption = (
             textwrap.shorten(answer, width=255, placeholder="...")
             + " (see attachment for the rest)"
@@ -55,7 +56,7 @@ class TextAsker(Asker):
             chat_id=message.chat_id,
             caption=caption,
             filename=f"{message.id}.md",
-            document=doc,
+            document=answer.encode(),
             reply_to_message_id=reply_to_message_id,
         )
 
@@ -64,7 +65,8 @@ class ImagineAsker(Asker):
     """Works with image generation AI."""
 
     model = ai.images.Model()
-    size_re = re.compile(r"(256|512|1024)(?:x\1)?\s?(?:px)?")
+    size_re = re.compile(r"(256|512|1024)(?:x\1)?\s?(?:px)?", re.ASCII)
+    size_widths = ("256", "512", "1024")
     sizes = {
         "256": "256x256",
         "512": "512x512",
@@ -78,24 +80,25 @@ class ImagineAsker(Asker):
 
     async def ask(self, prompt: str, question: str, history: list[tuple[str, str]]) -> str:
         """Asks AI a question."""
-        size = self._extract_size(question)
-        self.caption = self._extract_caption(question)
+        size, self.caption = self._parse(question)
         return await self.model.imagine(prompt=self.caption, size=size)
 
     async def reply(self, message: Message, context: CallbackContext, answer: str) -> None:
         """Replies with an answer from AI."""
         await message.reply_photo(answer, caption=self.caption)
 
-    def _extract_size(self, question: str) -> str:
-        match = self.size_re.search(question)
+    def _has_size(self, question: str) -> bool:
+        return any(width in question for width in self.size_widths)
+
+    def _parse(self, question: str) -> tuple[str, str]:
+        """Extracts the image size and the caption from the question."""
+        match = self.size_re.search(question) if self._has_size(question) else None
         if not match:
-            return self.default_size
+            return self.default_size, question.strip()
         width = match.group(1)
-        return self.sizes.get(width, width)
-
-    def _extract_caption(self, question: str) -> str:
+        # the first size wins, but all of them are removed from the caption
         caption = self.size_re.sub("", question).strip()
-        return caption
+        return self.sizes.get(width, width), caption
 
 
 def create(model: str, question: str) -> Asker:
@@ -1,14 +1,15 @@
 # Batch processing of incoming Telegram messages
 
 import asyncio
+import heapq
 import logging
-import tempfile
-from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from telegram import Chat, Message, Update
 from telegram.ext import CallbackContext
 
+from bot import ai
+from bot.cache import TextCache
 from bot.file_processor import FileProcessor
 from bot.voice import VoiceProcessor
 from bot.filters import Filters
@@ -35,32 +36,51 @@ class IncomingMessage:
 class MarkItDownMessage(IncomingMessage):
     """Processes documents, images and voice messages."""
 
+    # processed contents keyed by the Telegram file_unique_id,
+    # so that edited or re-sent files are not converted again
+    cache = TextCache(ttl=600, max_chars=1_000_000)
+
     def __init__(self, message: Message, file_proc: FileProcessor) -> None:
         super().__init__(message)
         self.file_processor = file_proc
 
     async def process(self) -> None:
-        content_parts = []
-
-        if self.message.document or self.message.photo:
-            file_content = await self.file_processor.process_files(
-                documents=[self.message.document] if self.message.document else [],
-                photos=self.message.photo if self.message.photo else [],
-            )
-            if file_content:
-                content_parts.append(file_content)
+        has_files = bool(self.message.document or self.message.photo)
+        if not has_files and not self.message.voice:
+            # text is collected by the batch itself, nothing to process here
+            return
 
+        # files and voice are independent, so process them concurrently
+        tasks = []
+        if has_files:
+            file = self.message.document or self.message.photo[-1]
+            tasks.append(self._cached(file.file_unique_id, self._process_files))
         if self.message.voice:
-            voice_file = await self.message.voice.get_file()
-            with tempfile.NamedTemporaryFile(suffix=".ogg", delete=False) as tmp_file:
-                await voice_file.download_to_drive(tmp_file.name)
-                voice_path = Path(tmp_file.name)
-            voice_content = await voice_processor.transcribe(voice_path)
-            voice_path.unlink()
-            if voice_content:
-                content_parts.append(voice_content)
+            tasks.append(self._cached(self.message.voice.file_unique_id, self._process_voice))
+        results = await asyncio.gather(*tasks)
+        self.content = "\n\n".join(result for result in results if result)
+
+    async def _cached(
+        self, key: str, func: Callable[[], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        content = await func()
+        if content:
+            self.cache.set(key, content)
+        return content
+
+    async def _process_files(self) -> Optional[str]:
+        return await self.file_processor.process_files(
+            documents=[self.message.document] if self.message.document else [],
+            photos=self.message.photo if self.message.photo else [],
+        )
 
-        self.content = "\n\n".join(content_parts)
+    async def _process_voice(self) -> Optional[str]:
+        voice_file = await self.message.voice.get_file()
+        voice_data = await voice_file.download_as_bytearray()
+        return await voice_processor.transcribe_bytes(bytes(voice_data))
 
 
 class BatchMessage:
@@ -72,9 +92,11 @@ class BatchMessage:
         self.last_update: Optional[Update] = None
         self.context: Optional[CallbackContext] = None
         self.has_voice: bool = False
-        self.caption: Optional[str] = None
+        self.has_media: bool = False
+        self.captions: List[str] = []
         self.is_follow_up: bool = False
         self.addressed: bool = False
+        self.is_finalizing: bool = False
 
     def add(self, msg: IncomingMessage, update: Update, context: CallbackContext) -> None:
         self.messages.append(msg)
@@ -89,42 +111,33 @@ class BatchMessage:
             self.addressed = True
         if msg.message.voice:
             self.has_voice = True
-        if msg.message.caption:
-            if self.caption:
-                self.caption = f"{self.caption}\n{msg.message.caption}"
-            else:
-                self.caption = msg.message.caption
-        elif msg.message.text:
-            if self.caption:
-                self.caption = f"{self.caption}\n{msg.message.text}"
-            else:
-                self.caption = msg.message.text
+        if msg.message.voice or msg.message.document or msg.message.photo:
+            self.has_media = True
+        text = msg.message.caption or msg.message.text
+        if text and (not self.captions or text != self.captions[-1]):
+            # the same text sent twice in a row would only waste tokens
+            self.captions.append(text)
+
+    @property
+    def caption(self) -> Optional[str]:
+        return "\n".join(self.captions) if self.captions else None
 
     def is_ready(self) -> bool:
         return all(t.done() for t in self.tasks)
 
     async def wait_until_ready(self) -> None:
         """Waits until all processing tasks are finished."""
-        while True:
-            pending = [t for t in self.tasks if not t.done()]
-            if not pending:
-                break
-            await asyncio.gather(*pending, return_exceptions=True)
+        # the batch does not accept new messages once finalizing,
+        # so the task list is complete at this point
+        await asyncio.gather(*self.tasks, return_exceptions=True)
 
     async def get_full_prompt(self) -> str:
         if self.tasks:
             await self.wait_until_ready()
 
-        content_parts = [m.content for m in self.messages if m.content]
-        full_content = "\n\n".join(content_parts)
-
-        final_parts = []
-        if self.caption:
-            final_parts.append(self.caption)
-        if full_content:
-            final_parts.append(full_content)
-
-        full_prompt = "\n\n".join(final_parts)
+        parts = [self.caption] if self.captions else []
+        parts.extend(m.content for m in self.messages if m.content)
+        full_prompt = "\n\n".join(parts)
         if self.is_follow_up:
             return f"+ {full_prompt}"
         return full_prompt
@@ -139,12 +152,23 @@ class BatchMessage:
 class BatchProcessor:
     """Collects messages for a user and sends them as a single request."""
 
+    # a batch is sent right away once it reaches this many messages,
+    # so a flood of messages cannot keep postponing it forever
+    max_size = 20
+
     def __init__(self, reply_func, buffer_time: float = 1.5) -> None:
         self.reply_func = reply_func
         self.buffer_time = buffer_time
         self.batches: Dict[int, BatchMessage] = {}
-        self.timers: Dict[int, asyncio.TimerHandle] = {}
-        self.tokens: Dict[int, int] = {}
+        # the latest finalization time for each user,
+        # and a heap of (deadline, user_id) pairs to check them in order
+        self.deadlines: Dict[int, float] = {}
+        self.queue: List[Tuple[float, int]] = []
+        self.sweeper: Optional[asyncio.Task] = None
+        # the latest batch being sent for each user
+        self.sending: Dict[int, asyncio.Task] = {}
+        # connection warmup running in the background
+        self.warming: Optional[asyncio.Task] = None
 
     async def add_message(
             self,
@@ -154,42 +178,102 @@ class BatchProcessor:
     ) -> None:
         user_id = update.effective_user.id
         batch = self.batches.get(user_id)
-        if not batch:
+        if not batch or batch.is_finalizing:
             batch = BatchMessage()
             self.batches[user_id] = batch
 
+        if not batch.has_media and (message.voice or message.document or message.photo):
+            # media processing takes a while, so connect to the AI in the meantime
+            self._warmup()
+
         incoming = MarkItDownMessage(message, file_proc=file_processor)
         batch.add(incoming, update, context)
 
-        if user_id in self.timers:
-            self.timers[user_id].cancel()
-        token = self.tokens.get(user_id, 0) + 1
-        self.tokens[user_id] = token
-        loop = asyncio.get_running_loop()
-        self.timers[user_id] = loop.call_later(
-            self.buffer_time,
-            lambda tok=token: asyncio.create_task(self._finalize_batch(user_id, tok)),
-        )
+        if len(batch.messages) >= self.max_size:
+            self.deadlines.pop(user_id, None)
+            self._start_sending(user_id, batch)
+            return
 
-    async def _finalize_batch(self, user_id: int, token: int) -> None:
-        if self.tokens.get(user_id) != token:
-            # A newer batch timer exists, so skip finalizing
+        deadline = asyncio.get_running_loop().time() + self.buffer_time
+        self.deadlines[user_id] = deadline
+        heapq.heappush(self.queue, (deadline, user_id))
+        if not self.sweeper or self.sweeper.done():
+            self.sweeper = asyncio.create_task(self._sweep())
+
+    def _warmup(self) -> None:
+        """Starts the connection warmup, unless it is already running."""
+        if self.warming and not self.warming.done():
             return
-        batch = self.batches.get(user_id)
-        if not batch:
+        self.warming = asyncio.create_task(ai.chat.warmup())
+
+    async def _sweep(self) -> None:
+        """Finalizes batches as their buffer time runs out."""
+        loop = asyncio.get_running_loop()
+        while self.queue:
+            # deadlines only grow, so the heap top is always the earliest one
+            deadline, user_id = self.queue[0]
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self.queue)
+            if self.deadlines.get(user_id) != deadline:
+                # a newer message has postponed this batch
+                continue
+            del self.deadlines[user_id]
+            if user_id in self.sending:
+                # the previous answer is still on its way, so keep collecting
+                # messages and send them all together once it is done
+                continue
+            batch = self.batches.get(user_id)
+            if batch and not batch.is_finalizing:
+                self._start_sending(user_id, batch)
+
+    def _start_sending(self, user_id: int, batch: BatchMessage) -> None:
+        """Closes the batch for new messages and sends it in the background."""
+        # mark it right away, so that messages arriving before the task starts
+        # go to a new batch instead of being lost with this one
+        batch.is_finalizing = True
+        logger.debug("Sending batch: user=%s, n_messages=%s", user_id, len(batch.messages))
+        previous = self.sending.get(user_id)
+        task = asyncio.create_task(self._send_batch(user_id, batch, previous))
+        self.sending[user_id] = task
+        task.add_done_callback(lambda t: self._forget_sending(user_id, t))
+
+    def _forget_sending(self, user_id: int, task: asyncio.Task) -> None:
+        if self.sending.get(user_id) is not task:
             return
+        del self.sending[user_id]
+        # send the batch that was held back while waiting for this answer
+        batch = self.batches.get(user_id)
+        if batch and not batch.is_finalizing and user_id not in self.deadlines:
+            self._start_sending(user_id, batch)
+
+    async def _send_batch(
+            self,
+            user_id: int,
+            batch: BatchMessage,
+            previous: Optional[asyncio.Task] = None,
+    ) -> None:
+        """
+        Prepares the batch prompt and replies to it.
+        Batches of different users are independent, while the batches
+        of the same user are answered in order: the prompt is prepared
+        right away, but the reply waits for the `previous` batch.
+        """
+        batch.is_finalizing = True
 
         prompt = await batch.get_full_prompt()
         update = batch.last_update
         context = batch.context
         message = batch.last_message
+        if previous:
+            await asyncio.wait([previous])
 
         # If there's no prompt at all (e.g., an empty message or a file that couldn't be read), do nothing.
         if not prompt.strip():
             logger.warning("Finalized batch has an empty prompt. Skipping.")
-            return
-
-        if update and context and message:
+        elif update and context and message:
             if message.chat.type != Chat.PRIVATE and not batch.addressed:
                 logger.info("Skipping unaddressed batch in group chat")
             else:
@@ -201,9 +285,7 @@ class BatchProcessor:
                     send_voice_reply=batch.has_voice,
                 )
 
-        # Cleanup
-        timer = self.timers.pop(user_id, None)
-        if timer:
-            timer.cancel()
+        # Cleanup, unless new messages have started another batch meanwhile
+        if self.batches.get(user_id) is not batch:
+            return
         self.batches.pop(user_id, None)
-        self.tokens.pop(user_id, None)
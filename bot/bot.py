@@ -1,28 +1,30 @@
 """Telegram chat bot built using the language model from OpenAI."""
 
+import asyncio
 import logging
 import sys
-import textwrap
 import time
+from typing import Optional
 
 from telegram import Chat, Message, Update
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     ApplicationBuilder,
     CallbackContext,
     CommandHandler,
     MessageHandler,
+    PersistenceInput,
     PicklePersistence,
 )
-from telegram.ext import filters as tg_filters
 
-from bot import askers, commands, models, questions
+from bot import ai, askers, commands, models, questions
 from bot.config import config
 from bot.fetcher import Fetcher
 from bot.filters import Filters
 from bot.models import ChatData, UserData
-from bot.voice import VoiceProcessor
-from bot.batching import BatchProcessor
+from bot.batching import BatchProcessor, file_processor, voice_processor
+from bot.commands.error import truncate
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -45,17 +47,41 @@ fetcher = Fetcher()
 # telegram message filters
 filters = Filters()
 
-voice_processor = VoiceProcessor()
+# Telegram shows the typing action for 5 seconds,
+# so there is no need to send it more often than that
+TYPING_INTERVAL = 4  # seconds
+# the last time the typing action was sent, keyed by (chat_id, thread_id)
+typing_sent: dict[tuple[int, Optional[int]], float] = {}
+
+# how often the bot state is written to disk
+PERSISTENCE_INTERVAL = 60  # seconds
+# how many times to resend a request that hit Telegram flood limits
+RATE_LIMIT_RETRIES = 3
 
 
 def main():
-    persistence = PicklePersistence(filepath=config.persistence_path)
+    try:
+        # libuv-based event loop, noticeably faster on socket-heavy workloads
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    persistence = PicklePersistence(
+        filepath=config.persistence_path,
+        # the bot only keeps per-user and per-chat state
+        store_data=PersistenceInput(bot_data=False, callback_data=False),
+        update_interval=PERSISTENCE_INTERVAL,
+    )
     application = (
         ApplicationBuilder()
         .token(config.telegram.token)
         .post_init(post_init)
         .post_shutdown(post_shutdown)
         .persistence(persistence)
+        # keeps within Telegram flood limits and retries after RetryAfter errors
+        .rate_limiter(AIORateLimiter(max_retries=RATE_LIMIT_RETRIES))
         .concurrent_updates(True)
         .get_updates_http_version("1.1")
         .http_version("1.1")
@@ -119,19 +145,7 @@ def add_handlers(application: Application):
         )
 
     # text message handler
-    application.add_handler(
-        MessageHandler(
-            (
-                    filters.text_filter
-                    | tg_filters.PHOTO
-                    | tg_filters.Document.ALL
-                    | tg_filters.VOICE
-            )
-            & ~tg_filters.COMMAND
-            & filters.users_or_chats,
-            message_handler,
-        )
-    )
+    application.add_handler(MessageHandler(filters.incoming_messages, message_handler))
 
     # generic error handler
     application.add_error_handler(commands.Error())
@@ -140,23 +154,37 @@ def add_handlers(application: Application):
 async def post_init(application: Application) -> None:
     """Defines bot settings."""
     bot = application.bot
-    logging.info(f"config: file={config.filename}, version={config.version}")
-    logging.info(f"allowed users: {config.telegram.usernames}")
-    logging.info(f"allowed chats: {config.telegram.chat_ids}")
-    logging.info(f"admins: {config.telegram.admins}")
-    logging.info(f"model name: {config.openai.model}")
-    logging.info(f"bot: username={bot.username}, id={bot.id}")
+    logging.info("config: file=%s, version=%s", config.filename, config.version)
+    logging.info("allowed users: %s", config.telegram.usernames)
+    logging.info("allowed chats: %s", config.telegram.chat_ids)
+    logging.info("admins: %s", config.telegram.admins)
+    logging.info("model name: %s", config.openai.model)
+    logging.info("bot: username=%s, id=%s", bot.username, bot.id)
     logging.info(
-        f"voice processing: enabled={config.voice.enabled}, "
-        f"tts_enabled={config.voice.tts_enabled}, "
-        f"language={config.voice.language}"
+        "voice processing: enabled=%s, tts_enabled=%s, language=%s",
+        config.voice.enabled,
+        config.voice.tts_enabled,
+        config.voice.language,
     )
     await bot.set_my_commands(commands.BOT_COMMANDS)
+    # connect to the AI provider before the first question arrives
+    application.create_task(ai.chat.warmup())
+    # load the file converter in the background while the bot starts polling
+    application.create_task(preload_files())
+
+
+async def preload_files() -> None:
+    """Loads the file converter, so that the first file does not wait for it."""
+    try:
+        await asyncio.to_thread(file_processor.preload)
+    except Exception as exc:
+        logger.error("Failed to preload the file converter: %s", exc)
 
 
 async def post_shutdown(application: Application) -> None:
     """Frees acquired resources."""
-    await fetcher.close()
+    await asyncio.gather(fetcher.close(), ai.client.close())
+    file_processor.close()
 
 
 def with_message_limit(func):
@@ -194,12 +222,13 @@ def with_message_limit(func):
             message=message,
             context=context,
             question=question,
+            user=user,
             **kwargs,
         )
 
         # increment the message counter
         message_count = user.message_counter.increment()
-        logger.debug(f"user={username}, n_messages={message_count}")
+        logger.debug("user=%s, n_messages=%s", username, message_count)
 
     return wrapper
 
@@ -213,38 +242,35 @@ async def reply_to(
         context: CallbackContext,
         question: str,
         send_voice_reply: bool = False,
+        user: Optional[UserData] = None,
 ) -> None:
     """Replies to a prepared question."""
-    logger.info(
-        f"Reply_to called for user={update.effective_user.username} with prepared prompt."
-    )
+    user_id = message.from_user.username or message.from_user.id
+    is_private = message.chat.type == Chat.PRIVATE
+    logger.info("Reply_to called for user=%s with prepared prompt.", user_id)
 
     if not question:
         logger.warning("Prompt is empty, skipping reply.")
         return
 
-    await message.chat.send_action(
-        action="typing", message_thread_id=message.message_thread_id
-    )
+    await send_typing(message)
 
     try:
         chat = ChatData(context.chat_data)
         model_name = chat.model or config.openai.model
         asker = askers.create(model_name, question)
 
-        user_id = message.from_user.username or message.from_user.id
-        logger.info(
-            f"-> question id={message.id}, user={user_id}, n_chars={len(question)}"
-        )
+        logger.info("-> question id=%s, user=%s, n_chars=%s", message.id, user_id, len(question))
 
         prepared_question, is_follow_up = questions.prepare(question)
         prepared_question = await fetcher.substitute_urls(prepared_question)
 
         # The logic for `last_file_content` has been removed.
         # The batcher now handles combining files and text.
-        user = UserData(context.user_data)
+        # with_message_limit has already loaded the user data
+        user = user or UserData(context.user_data)
 
-        if message.chat.type == Chat.PRIVATE:
+        if is_private:
             if is_follow_up:
                 history = user.messages.as_list()
             else:
@@ -263,21 +289,21 @@ async def reply_to(
         elapsed = int((time.perf_counter_ns() - start) / 1e6)
 
         logger.info(
-            f"<- answer id={message.id}, user={user_id}, "
-            f"n_chars={len(answer)}, len_history={len(history)}, took={elapsed}ms"
+            "<- answer id=%s, user=%s, n_chars=%s, len_history=%s, took=%sms",
+            message.id,
+            user_id,
+            len(answer),
+            len(history),
+            elapsed,
         )
 
         user.messages.add(question, answer)
         await asker.reply(message, context, answer)
 
         if send_voice_reply and config.voice.tts_enabled:
-            speech_file = await voice_processor.text_to_speech(answer)
-            if speech_file:
-                try:
-                    with open(speech_file, "rb") as audio:
-                        await message.reply_voice(audio)
-                finally:
-                    speech_file.unlink()
+            speech = await voice_processor.text_to_speech(answer)
+            if speech:
+                await message.reply_voice(speech)
 
     except Exception as exc:
         class_name = f"{exc.__class__.__module__}.{exc.__class__.__qualname__}"
@@ -286,8 +312,22 @@ async def reply_to(
         if token:
             error_text = error_text.replace(token, "***")
         logger.error("Failed to answer: %s", error_text)
-        text = textwrap.shorten(f"⚠️ {error_text}", width=255, placeholder="...")
-        await message.reply_text(text)
+        await message.reply_text(truncate(f"⚠️ {error_text}"))
+
+
+async def send_typing(message: Message) -> None:
+    """Shows the typing action, at most once per interval for each chat thread."""
+    key = (message.chat_id, message.message_thread_id)
+    now = time.monotonic()
+    sent = typing_sent.get(key)
+    if sent is not None and now - sent < TYPING_INTERVAL:
+        return
+    if len(typing_sent) > 1000:
+        # forget chats that have been quiet for a while
+        for stale_key in [k for k, t in typing_sent.items() if now - t >= TYPING_INTERVAL]:
+            del typing_sent[stale_key]
+    typing_sent[key] = now
+    await message.chat.send_action(action="typing", message_thread_id=message.message_thread_id)
 
 
 # Batch processor instance created after reply function is defined
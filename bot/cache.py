@@ -0,0 +1,51 @@
+"""In-memory cache for fetched and converted texts."""
+
+import time
+from typing import Optional
+
+
+class TextCache:
+    """
+    Keeps texts for a limited time and up to a total length.
+    All entries live for the same time, so the oldest ones expire first.
+    """
+
+    def __init__(self, ttl: float, max_chars: int) -> None:
+        self.ttl = ttl
+        self.max_chars = max_chars
+        # texts with their expiration time, from oldest to newest
+        self.items: dict[str, tuple[str, float]] = {}
+        # the total length of the cached texts
+        self.n_chars = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the text if it is cached and not expired yet."""
+        item = self.items.get(key)
+        if item and item[1] > time.monotonic():
+            return item[0]
+        return None
+
+    def set(self, key: str, text: str) -> None:
+        """Caches the text, evicting expired and then oldest entries to fit it."""
+        if len(text) > self.max_chars:
+            # too large to cache at all
+            return
+        self._pop(key)
+        now = time.monotonic()
+        while self.items:
+            oldest = next(iter(self.items))
+            expires_at = self.items[oldest][1]
+            if expires_at > now and self.n_chars + len(text) <= self.max_chars:
+                break
+            self._pop(oldest)
+        self.items[key] = (text, now + self.ttl)
+        self.n_chars += len(text)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.n_chars = 0
+
+    def _pop(self, key: str) -> None:
+        item = self.items.pop(key, None)
+        if item:
+            self.n_chars -= len(item[0])
@@ -1,13 +1,15 @@
 """Generic error handler."""
 
 import logging
-import textwrap
 
 from telegram import Chat, Update
 from telegram.ext import CallbackContext
 
 logger = logging.getLogger(__name__)
 
+# Telegram shows long error messages poorly, so they are cut to this length
+MAX_ERROR_LENGTH = 255
+
 
 class ErrorCommand:
     """If the bot failed to answer, prints the error and the stack trace (if any)."""
@@ -22,10 +24,19 @@ class ErrorCommand:
         class_name = f"{context.error.__class__.__module__}.{context.error.__class__.__qualname__}"
         error_text = f"{class_name}: {context.error}"
         logger.warning("Exception while handling an update %s: %s", update, error_text)
-        text = textwrap.shorten(f"⚠️ {error_text}", width=255, placeholder="...")
+        text = truncate(f"⚠️ {error_text}")
 
         message = update.message
         reply_to_message_id = message.id if message and message.chat.type != Chat.PRIVATE else None
         await context.bot.send_message(
             update.effective_chat.id, text, reply_to_message_id=reply_to_message_id
         )
+
+
+def truncate(text: str, maxlen: int = MAX_ERROR_LENGTH) -> str:
+    """Shortens the text to `maxlen` characters, ending it with an ellipsis."""
+    if len(text) <= maxlen:
+        return text
+    # cut at the last word boundary that leaves room for the ellipsis
+    cut = text.rfind(" ", 0, maxlen - 2)
+    return text[: cut if cut > 0 else maxlen - 3] + "..."
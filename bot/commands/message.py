@@ -1,19 +1,16 @@
 """Text message handler."""
 
 import logging
-from typing import Awaitable
-from pathlib import Path
-import tempfile
+from typing import Awaitable, Optional
 
 from telegram import Chat, Update
 from telegram.ext import CallbackContext
 
 from bot import questions
-from bot.file_processor import FileProcessor
+from bot.batching import file_processor, voice_processor
 from bot.config import config
 from bot.models import UserData
 from bot.filters import Filters
-from bot.voice import VoiceProcessor
 
 logger = logging.getLogger(__name__)
 
@@ -23,39 +20,47 @@ class MessageCommand:
 
     def __init__(self, reply_func: Awaitable) -> None:
         self.reply_func = reply_func
-        self.voice_processor = VoiceProcessor()
+        self.voice_processor = voice_processor
         self.filters = Filters()
+        # the bot username does not change while the bot is running
+        self._bot_username: Optional[str] = None
 
     async def __call__(self, update: Update, context: CallbackContext) -> None:
         message = update.message or update.edited_message
-        logger.info(
-            f"Message handler called: "
-            f"from={update.effective_user.username}, "
-            f"text={bool(message.text)}, "
-            f"voice={bool(message.voice)}, "
-            f"document={message.document.file_name if message.document else None}, "
-            f"photo={bool(message.photo)}, "
-            f"caption={bool(message.caption)}"
-        )
 
         # Проверяем, групповой ли это чат
         is_group = message.chat.type != Chat.PRIVATE
+        is_bot_mentioned = is_reply_to_bot = False
+
+        if is_group:
+            # Проверяем взаимодействие с ботом
+            if self._bot_username is None:
+                self._bot_username = context.bot.username
+            is_bot_mentioned = self.filters.is_bot_mentioned(message, self._bot_username)
+            is_reply_to_bot = self.filters.is_reply_to_bot(message, self._bot_username)
+
+            # В групповом чате обрабатываем только сообщения с упоминанием бота
+            # или ответы боту, и отбрасываем остальные до любой другой работы
+            if not (is_bot_mentioned or is_reply_to_bot):
+                logger.debug("Ignoring message in group chat - no bot interaction")
+                return
 
-        # Проверяем взаимодействие с ботом
-        is_bot_mentioned = self.filters.is_bot_mentioned(message, context.bot.username)
-        is_reply_to_bot = self.filters.is_reply_to_bot(message, context.bot.username)
-
-        # В групповом чате обрабатываем только сообщения с упоминанием бота или ответы боту
-        if is_group and not (is_bot_mentioned or is_reply_to_bot):
-            logger.info("Ignoring message in group chat - no bot interaction")
-            return
-
-        # Обработка голосовых сообщений
-        if message.voice:
-            if is_group and not is_reply_to_bot:
-                logger.info("Ignoring voice message in group chat - not a reply to bot")
+            # Голосовые в группе обрабатываем только в ответ боту
+            if message.voice and not is_reply_to_bot:
+                logger.debug("Ignoring voice message in group chat - not a reply to bot")
                 return
 
+        logger.info(
+            "Message handler called: from=%s, text=%s, voice=%s, document=%s, "
+            "photo=%s, caption=%s",
+            update.effective_user.username,
+            bool(message.text),
+            bool(message.voice),
+            message.document.file_name if message.document else None,
+            bool(message.photo),
+            bool(message.caption),
+        )
+
         # File attachments are processed later by the batch processor
         file_content = None
 
@@ -79,15 +84,12 @@ class MessageCommand:
                 if message.reply_to_message.voice:
                     # Обработка голосового из reply
                     voice_file = await message.reply_to_message.voice.get_file()
-                    with tempfile.NamedTemporaryFile(
-                        suffix=".ogg", delete=False
-                    ) as tmp_file:
-                        await voice_file.download_to_drive(tmp_file.name)
-                        voice_path = Path(tmp_file.name)
+                    voice_data = await voice_file.download_as_bytearray()
 
                     # Транскрибируем голосовое в текст
-                    voice_content = await self.voice_processor.transcribe(voice_path)
-                    voice_path.unlink()  # Очищаем
+                    voice_content = await self.voice_processor.transcribe_bytes(
+                        bytes(voice_data)
+                    )
 
                     if voice_content:
                         file_content = voice_content
@@ -101,29 +103,26 @@ class MessageCommand:
                     message.reply_to_message.document or message.reply_to_message.photo
                 ):
                     # Обработка файла из reply
-                    with FileProcessor() as file_processor:
-                        file_content = await file_processor.process_files(
-                            documents=(
-                                [message.reply_to_message.document]
-                                if message.reply_to_message.document
-                                else []
-                            ),
-                            photos=(
-                                message.reply_to_message.photo
-                                if message.reply_to_message.photo
-                                else []
-                            ),
-                        )
+                    file_content = await file_processor.process_files(
+                        documents=(
+                            [message.reply_to_message.document]
+                            if message.reply_to_message.document
+                            else []
+                        ),
+                        photos=(
+                            message.reply_to_message.photo
+                            if message.reply_to_message.photo
+                            else []
+                        ),
+                    )
 
         # Use file content from previous message if any
         if question and not file_content:
             user = UserData(context.user_data)
             file_content = user.data.pop("last_file_content", None)
-            if file_content:
-                question = f"{question}\n\n{file_content}"
 
         if file_content:
-            question = f"{question}\n\n{file_content}" if question else file_content
+            question = "\n\n".join(part for part in (question, file_content) if part)
 
         await self.reply_func(
             update=update, message=message, context=context, question=question
@@ -1,13 +1,16 @@
+import asyncio
 import json
 import re
 import urllib.parse
 import ipaddress
+from typing import Optional
 
 import aiohttp
 import httpx
 from bs4 import BeautifulSoup
 from httpx import HTTPStatusError, RequestError, TimeoutException
 
+from bot.cache import TextCache
 from bot.config import config
 
 # todo make scrape.do and httpx output similar
@@ -19,6 +22,11 @@ class Fetcher:
     # Matches non-quoted URLs in text
     url_re = re.compile(r"(?:[^'\"]|^)\b(https?://\S+)\b(?:[^'\"]|$)")
     timeout = 5  # seconds (you can increase if needed)
+    cache_ttl = 300  # seconds
+    # the total length of the cached page contents, in characters
+    cache_max_chars = 1_000_000
+    # how long idle connections to the fetched hosts stay open
+    keepalive_expiry = 30  # seconds
 
     def __init__(self):
         """
@@ -35,9 +43,21 @@ class Fetcher:
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.9",
         }
+        # one pooled client for all pages, so that repeated hosts skip the handshake
         self.client = httpx.AsyncClient(
-            follow_redirects=True, timeout=self.timeout, headers=headers
+            follow_redirects=True,
+            timeout=self.timeout,
+            headers=headers,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
         )
+        # Scrap.do session, created on first use since it needs a running loop
+        self.scrapdo_session: Optional[aiohttp.ClientSession] = None
+        # recently fetched page contents, keyed by URL
+        self.cache = TextCache(ttl=self.cache_ttl, max_chars=self.cache_max_chars)
 
     async def substitute_urls(self, text: str) -> str:
         """
@@ -45,17 +65,42 @@ class Fetcher:
         and appends the content to the text in a separated block.
         """
         urls = self._extract_urls(text)
-        for url in urls:
-            content_str = await self._fetch_url(url)
-            text += f"\n\n---\n{url} contents:\n\n{content_str}\n---"
-        return text
+        if not urls:
+            return text
+
+        # fetch all pages at once, so the total wait is that of the slowest one
+        contents = await asyncio.gather(*(self._fetch_cached(url) for url in urls))
+        # page contents can be large, so join them once instead of appending
+        parts = [text]
+        for url, content_str in zip(urls, contents):
+            parts.append(f"\n\n---\n{url} contents:\n\n{content_str}\n---")
+        return "".join(parts)
+
+    async def _fetch_cached(self, url: str) -> str:
+        """Returns the recently fetched page contents, or fetches the page."""
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+
+        content = await self._fetch_url(url)
+        if content.startswith("Failed to fetch"):
+            # let the next question try again
+            return content
+
+        self.cache.set(url, content)
+        return content
 
     async def close(self) -> None:
-        """Closes the underlying httpx client."""
+        """Closes the underlying HTTP clients."""
         await self.client.aclose()
+        if self.scrapdo_session:
+            await self.scrapdo_session.close()
 
     def _extract_urls(self, text: str) -> list[str]:
         """Finds all URLs in the text by regex and filters local addresses."""
+        if "http" not in text:
+            # no links, no need for the regex
+            return []
         urls = self.url_re.findall(text)
         return [url for url in urls if not self._is_local_url(url)]
 
@@ -139,25 +184,27 @@ class Fetcher:
         params = f"token={token}&url={encoded_url}"
         full_url = f"{base_api}?{params}"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                full_url,
-                timeout=self.timeout,
-                headers={
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
-                    "Accept-Encoding": "gzip, deflate",
-                },
-            ) as resp:
-                if resp.status == 401:
-                    raise ValueError("Invalid Scrap.do token OR Scrape.do is banned")
-                if resp.status == 429:
-                    raise ValueError("Scrap.do rate limit exceeded")
+        if not self.scrapdo_session or self.scrapdo_session.closed:
+            self.scrapdo_session = aiohttp.ClientSession()
+
+        async with self.scrapdo_session.get(
+            full_url,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
+                "Accept-Encoding": "gzip, deflate",
+            },
+        ) as resp:
+            if resp.status == 401:
+                raise ValueError("Invalid Scrap.do token OR Scrape.do is banned")
+            if resp.status == 429:
+                raise ValueError("Scrap.do rate limit exceeded")
 
-                resp.raise_for_status()
+            resp.raise_for_status()
 
-                html_text = await resp.text(encoding="utf-8")
-                fake_resp = FakeHttpxResponse(html_text, resp.headers)
-                return Content(fake_resp).extract_text()
+            html_text = await resp.text(encoding="utf-8")
+            fake_resp = FakeHttpxResponse(html_text, resp.headers)
+            return Content(fake_resp).extract_text()
 
 
 class FakeHttpxResponse:
@@ -166,6 +213,8 @@ class FakeHttpxResponse:
     that our Content class depends on.
     """
 
+    __slots__ = ("_text", "headers")
+
     def __init__(self, text: str, headers):
         self._text = text
         self.headers = headers
@@ -178,6 +227,8 @@ class FakeHttpxResponse:
 class Content:
     """Extracts resource content as human-readable text."""
 
+    __slots__ = ("content_type", "response")
+
     allowed_content_types = {
         "application/json",
         "application/sql",
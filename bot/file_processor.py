@@ -1,20 +1,24 @@
 """File processor for handling document attachments."""
 
 import asyncio
+import functools
+import io
 import logging
-import tempfile
 from pathlib import Path
 from typing import Optional, List, Tuple
 import concurrent.futures
 
-from markitdown import MarkItDown
-from openai import OpenAI  # Синхронная версия
+import httpx
+from openai import DefaultHttpxClient, OpenAI  # Синхронная версия
 from telegram import Document, PhotoSize
 
 from bot.config import config
 
 logger = logging.getLogger(__name__)
 
+# How long idle connections to the AI provider stay open, in seconds
+KEEPALIVE_EXPIRY = 60
+
 
 class FileProcessor:
     """Processes document attachments using MarkItDown."""
@@ -24,15 +28,40 @@ class FileProcessor:
         self.max_file_size = (
             config.files.max_file_size * 1024 * 1024
         )  # Convert MB to bytes
-        self.supported_extensions = config.files.supported_extensions
+        # checked for every document, and the file suffix is lowercased too
+        self.supported_extensions = frozenset(
+            ext.lower() for ext in config.files.supported_extensions
+        )
         # Создаем синхронный клиент
-        self.sync_client = OpenAI(api_key=config.openai.api_key)
-        self.md = MarkItDown(llm_client=self.sync_client, llm_model=config.openai.model)
+        # with the same long-lived keep-alive as the async one,
+        # since image descriptions come in bursts from a single batch
+        self.sync_client = OpenAI(
+            api_key=config.openai.api_key,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                )
+            ),
+        )
         # Создаем пул потоков
         self.executor = concurrent.futures.ThreadPoolExecutor()
 
+    @functools.cached_property
+    def md(self):
+        """MarkItDown converter, created on first use since its import is slow."""
+        from markitdown import MarkItDown
+
+        return MarkItDown(llm_client=self.sync_client, llm_model=config.openai.model)
+
+    def preload(self) -> None:
+        """Creates the converter in advance, so that the first file does not wait for it."""
+        self.md
+
     def close(self) -> None:
-        """Shuts down the executor."""
+        """Shuts down the executor and closes the OpenAI connections."""
+        self.sync_client.close()
         if self.executor:
             self.executor.shutdown(wait=False)
             self.executor = None
@@ -68,7 +97,7 @@ class FileProcessor:
         processed_content = []
         for i, result in enumerate(results, 1):
             if isinstance(result, Exception):
-                logger.error(f"Failed to process file {i}: {result}")
+                logger.error("Failed to process file %s: %s", i, result)
                 continue
             if result and isinstance(result, tuple):
                 filename, content = result
@@ -87,38 +116,31 @@ class FileProcessor:
                     f"Maximum size is {self.max_file_size/1024/1024:.1f}MB."
                 )
 
-            file_name = document.file_name.lower()
+            file_name = document.file_name or ""
             file_ext = Path(file_name).suffix.lower()
 
             if file_ext not in self.supported_extensions:
                 raise ValueError(f"Unsupported file type: {file_ext}")
 
-            with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp_file:
-                file_path = Path(tmp_file.name)
-
             # Download file
             file = await document.get_file()
-            await file.download_to_drive(file_path)
+            data = await file.download_as_bytearray()
 
-            try:
-                # Process file in thread
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    self.executor, lambda: self.md.convert(str(file_path))
-                )
-
-                if not result.text_content:
-                    logger.warning(f"No content extracted from {document.file_name}")
-                    return None
+            # Process file in thread, the converter spills it to disk there
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor,
+                lambda: self.md.convert_stream(io.BytesIO(data), file_extension=file_ext),
+            )
 
-                return document.file_name, result.text_content
+            if not result.text_content:
+                logger.warning("No content extracted from %s", file_name)
+                return None
 
-            finally:
-                # Cleanup
-                file_path.unlink()
+            return file_name, result.text_content
 
         except Exception as e:
-            logger.error(f"Failed to process document: {e}")
+            logger.error("Failed to process document: %s", e)
             return None
 
     async def _process_photo(self, photo: PhotoSize) -> Optional[Tuple[str, str]]:
@@ -130,30 +152,24 @@ class FileProcessor:
                     f"Maximum size is {self.max_file_size/1024/1024:.1f}MB."
                 )
 
-            with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp_file:
-                file_path = Path(tmp_file.name)
-
             # Download file
             file = await photo.get_file()
-            await file.download_to_drive(file_path)
-
-            try:
-                # Process image with custom prompt in thread
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    self.executor,
-                    lambda: self.md.convert(
-                        str(file_path), llm_prompt=config.files.image_recognition_prompt
-                    ),
-                )
-                return f"image_{photo.file_unique_id}", result.text_content
-
-            finally:
-                # Cleanup
-                file_path.unlink()
+            data = await file.download_as_bytearray()
+
+            # Process image with custom prompt in thread
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor,
+                lambda: self.md.convert_stream(
+                    io.BytesIO(data),
+                    file_extension=".jpg",
+                    llm_prompt=config.files.image_recognition_prompt,
+                ),
+            )
+            return f"image_{photo.file_unique_id}", result.text_content
 
         except Exception as e:
-            logger.error(f"Failed to process photo: {e}")
+            logger.error("Failed to process photo: %s", e)
             return None
 
     def __del__(self):
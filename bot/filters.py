@@ -1,5 +1,6 @@
 """Bot message filters."""
 
+import functools
 import logging
 from dataclasses import dataclass
 from typing import Union
@@ -23,14 +24,13 @@ class Filters:
     users_or_chats: filters.BaseFilter
     admins_private: filters.BaseFilter
     text_filter: filters.BaseFilter
+    incoming_messages: filters.BaseFilter
 
     def __init__(self) -> None:
         """Defines users and chats that are allowed to use the bot."""
         if config.telegram.usernames:
             self.users = filters.User(username=config.telegram.usernames)
-            # Convert all chat IDs to negative for groups
-            chat_ids = [-abs(chat_id) for chat_id in config.telegram.chat_ids]
-            self.chats = filters.Chat(chat_id=chat_ids)
+            self.chats = filters.Chat(chat_id=_group_ids(config.telegram.chat_ids))
         else:
             self.users = filters.ALL
             self.chats = filters.ALL
@@ -43,9 +43,18 @@ class Filters:
         self.users_or_chats = self.users | self.chats
         self.admins_private = self.admins & filters.ChatType.PRIVATE
         self.text_filter = filters.TEXT
+        # built once and shared by the message handler; the allowed users/chats
+        # check goes first, so that foreign updates are rejected right away
+        self.incoming_messages = (
+            self.users_or_chats
+            & (self.text_filter | filters.PHOTO | filters.Document.ALL | filters.VOICE)
+            & ~filters.COMMAND
+        )
 
         logger.info(
-            f"Filters initialized: text={self.text_filter}, users_or_chats={self.users_or_chats}"
+            "Filters initialized: text=%s, users_or_chats=%s",
+            self.text_filter,
+            self.users_or_chats,
         )
 
     def reload(self) -> None:
@@ -54,7 +63,7 @@ class Filters:
             # cannot update the filter from ALL to specific usernames without a restart
             raise Exception("Restart the bot for changes to take effect")
         self.users.usernames = config.telegram.usernames
-        self.chats.chat_ids = config.telegram.chat_ids
+        self.chats.chat_ids = _group_ids(config.telegram.chat_ids)
         self.admins.usernames = config.telegram.admins
 
     def is_known_user(self, username: str) -> bool:
@@ -70,10 +79,11 @@ class Filters:
             return False
 
         source = message.text if message.text is not None else message.caption or ""
+        mention = _mention(bot_username)
         for entity in entities:
-            if entity.type == MessageEntity.MENTION:
+            if entity.type == MessageEntity.MENTION and entity.length == len(mention):
                 mention_text = source[entity.offset : entity.offset + entity.length]
-                if mention_text.lower() == f"@{bot_username.lower()}":
+                if mention_text.lower() == mention:
                     return True
         return False
 
@@ -84,3 +94,14 @@ class Filters:
             and message.reply_to_message.from_user
             and message.reply_to_message.from_user.username == bot_username
         )
+
+
+def _group_ids(chat_ids: list[int]) -> list[int]:
+    """Converts all chat IDs to negative for groups."""
+    return [-abs(chat_id) for chat_id in chat_ids]
+
+
+@functools.lru_cache(maxsize=8)
+def _mention(username: str) -> str:
+    """Returns a lowercased @mention for the username."""
+    return f"@{username.lower()}"
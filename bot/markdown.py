@@ -1,5 +1,6 @@
 """Markdown/HTML text formatting."""
 
+import functools
 import re
 
 code_re = re.compile(r"`([^`\n]+)`")
@@ -13,6 +14,7 @@ bold_re = re.compile(r"\*\*([^<*]+?)\*\*")
 bullet_re = re.compile(r"^\*\s\s+(.+)$", re.MULTILINE)
 
 
+@functools.lru_cache(maxsize=128)
 def to_html(text: str) -> str:
     """
     Converts Markdown text to "Telegram HTML", which supports only some of the tags.
@@ -21,8 +23,12 @@ def to_html(text: str) -> str:
     but ignores all other formatting.
     """
     text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-    text = pre_re.sub(r"<pre>\1</pre>", text)
-    text = code_re.sub(r"<code>\1</code>", text)
-    text = bold_re.sub(r"<b>\1</b>", text)
-    text = bullet_re.sub(r"— \1", text)
+    # skip the patterns whose markers are not in the text
+    if "`" in text:
+        if "```" in text:
+            text = pre_re.sub(r"<pre>\1</pre>", text)
+        text = code_re.sub(r"<code>\1</code>", text)
+    if "*" in text:
+        text = bold_re.sub(r"<b>\1</b>", text)
+        text = bullet_re.sub(r"— \1", text)
     return text
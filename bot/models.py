@@ -56,8 +56,10 @@ class UserMessages:
     """Represents user message history."""
 
     def __init__(self, data: Mapping, maxlen: int) -> None:
-        messages = data.get("messages") or []
-        data["messages"] = deque(messages, maxlen)
+        messages = data.get("messages")
+        if not isinstance(messages, deque) or messages.maxlen != maxlen:
+            # copy only on the first use or when the history depth has changed
+            data["messages"] = deque(messages or [], maxlen)
         self.data = data
         self.messages = data["messages"]
 
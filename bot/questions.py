@@ -3,10 +3,11 @@
 import logging
 from typing import Optional
 
-from telegram import Message, MessageEntity
+from telegram import Document, Message, MessageEntity
 from telegram.ext import CallbackContext
 
 from bot import shortcuts
+from bot.config import config
 from bot.filters import Filters
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,16 @@ logger = logging.getLogger(__name__)
 # Создаем экземпляр фильтров
 filters = Filters()
 
+# Non-"text/*" MIME types that are still plain text
+TEXT_MIME_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/x-sh",
+    "application/x-yaml",
+    "application/xml",
+    "application/yaml",
+}
+
 
 async def extract_private(message: Message, context: CallbackContext) -> Optional[str]:
     """Extracts a question from a private message."""
@@ -27,52 +38,34 @@ async def extract_private(message: Message, context: CallbackContext) -> Optiona
 
 async def extract_group(message: Message, context: CallbackContext) -> tuple[str, Message]:
     """Extracts a question from a group chat message."""
-    base_text = message.text or message.caption or ""
-    doc_suffix = ""
-    if message.document:
-        file = await context.bot.get_file(message.document.file_id)
-        content = await file.download_as_bytearray()
-        try:
-            decoded = content.decode()
-        except Exception:
-            decoded = ""
-        if decoded:
-            doc_suffix = f"\n\n{message.document.file_name}:\n```\n{decoded}\n```"
-    text = base_text + doc_suffix
-
-    is_bot_mentioned = filters.is_bot_mentioned(message, context.bot.username)
-    is_reply_to_bot = filters.is_reply_to_bot(message, context.bot.username)
+    bot_username = context.bot.username
+    is_bot_mentioned = filters.is_bot_mentioned(message, bot_username)
+    is_reply_to_bot = filters.is_reply_to_bot(message, bot_username)
 
     if not (is_bot_mentioned or is_reply_to_bot):
+        # not a question to the bot, so don't download anything
         return "", message
 
+    base_text = message.text or message.caption or ""
+    doc_suffix = await _extract_document(message, context)
+
     if is_reply_to_bot:
+        text = base_text + doc_suffix
         return (f"+ {text}" if text else "", message)
 
-    if is_bot_mentioned:
-        clean = base_text
-        for entity in message.entities or message.caption_entities or []:
-            if entity.type == MessageEntity.MENTION:
-                clean = (
-                    clean[: entity.offset] + clean[entity.offset + entity.length :]
-                ).strip()
-        text = clean + doc_suffix
+    entities = message.entities or message.caption_entities or ()
+    text = _strip_mentions(base_text, entities) + doc_suffix
 
-        if message.reply_to_message:
-            reply_text = await _extract_text(message.reply_to_message, context)
-            return (f"{text}: {reply_text}" if text else reply_text, message.reply_to_message)
-
-        return text, message
+    if message.reply_to_message:
+        reply_text = await _extract_text(message.reply_to_message, context)
+        return (f"{text}: {reply_text}" if text else reply_text, message.reply_to_message)
 
-    return "", message
+    return text, message
 
 
 def extract_prev(message: Message, context: CallbackContext) -> str:
     """Extracts the previous message by the bot, if any."""
-    if (
-        message.reply_to_message
-        and message.reply_to_message.from_user.username == context.bot.username
-    ):
+    if filters.is_reply_to_bot(message, context.bot.username):
         # treat a reply to the bot as a follow-up question
         return message.reply_to_message.text
 
@@ -86,19 +79,20 @@ def prepare(question: str) -> tuple[str, bool]:
     and indicates whether it is a follow-up.
     """
 
-    if question[0] == "+":
-        question = question.strip("+ ")
+    if question.startswith("+"):
+        # strip only the leading markers, so that "+ What is C++" keeps its pluses
+        question = question.lstrip("+ ")
         is_follow_up = True
     else:
         is_follow_up = False
 
-    if question[0] == "!":
+    if question.startswith("!"):
         # this is a shortcut, so the bot should
         # process the question before asking it
         shortcut, question = shortcuts.extract(question)
         question = shortcuts.apply(shortcut, question)
 
-    elif question[0] == "/":
+    elif question.startswith("/"):
         # this is a command, so the bot should
         # strip it from the question before asking
         _, _, question = question.partition(" ")
@@ -107,17 +101,55 @@ def prepare(question: str) -> tuple[str, bool]:
     return question, is_follow_up
 
 
+def _strip_mentions(text: str, entities: tuple[MessageEntity, ...]) -> str:
+    """Removes all @mentions from the text in a single pass."""
+    spans = sorted(
+        (entity.offset, entity.offset + entity.length)
+        for entity in entities
+        if entity.type == MessageEntity.MENTION
+    )
+    if not spans:
+        return text.strip()
+    parts = []
+    pos = 0
+    for start, end in spans:
+        parts.append(text[pos:start])
+        pos = max(pos, end)
+    parts.append(text[pos:])
+    return "".join(parts).strip()
+
+
 async def _extract_text(message: Message, context: CallbackContext) -> str:
     """Extracts text from a text message or a document message."""
     text = message.text or message.caption or ""
-
-    if message.document:
-        file = await context.bot.get_file(message.document.file_id)
-        content = await file.download_as_bytearray()
+    return text + await _extract_document(message, context)
+
+
+async def _extract_document(message: Message, context: CallbackContext) -> str:
+    """Downloads a text document attached to the message, if any."""
+    if not message.document or not _is_text(message.document):
+        # binary files would only fail to decode, so don't download them
+        return ""
+    file = await context.bot.get_file(message.document.file_id)
+    content = await file.download_as_bytearray()
+    if message.document.mime_type:
+        # a declared text file with a few broken bytes keeps its readable part
+        decoded = bytes(content).decode("utf-8", errors="replace")
+    else:
+        # a file of unknown type is skipped unless it is valid text
         try:
-            decoded = content.decode()
-        except Exception:
+            decoded = bytes(content).decode("utf-8")
+        except UnicodeDecodeError:
             decoded = ""
-        if decoded:
-            text += f"\n\n{message.document.file_name}:\n```\n{decoded}\n```"
-    return text
+    if not decoded:
+        return ""
+    return f"\n\n{message.document.file_name}:\n```\n{decoded}\n```"
+
+
+def _is_text(document: Document) -> bool:
+    """Checks if the document is a reasonably sized plain text file."""
+    if document.file_size and document.file_size > config.files.max_file_size * 1024 * 1024:
+        return False
+    mime_type = document.mime_type
+    # unknown types are given a chance to decode
+    return not mime_type or mime_type.startswith("text/") or mime_type in TEXT_MIME_TYPES
@@ -1,12 +1,9 @@
 """Voice message processor."""
 
 import logging
-import tempfile
-from pathlib import Path
 from typing import Optional
 
-from openai import AsyncOpenAI
-
+from bot.ai.client import openai
 from bot.config import config
 
 logger = logging.getLogger(__name__)
@@ -24,47 +21,39 @@ class VoiceProcessor:
         self.max_file_size = (
             config.voice.max_file_size * 1024 * 1024
         )  # Convert MB to bytes
-        self.client = AsyncOpenAI(
-            api_key=config.openai.api_key, base_url=config.openai.url
-        )
+        self.client = openai
 
-    async def transcribe(self, voice_file: Path) -> Optional[str]:
-        """Transcribes voice message to text using Whisper API."""
+    async def transcribe_bytes(
+        self, data: bytes, filename: str = "voice.ogg"
+    ) -> Optional[str]:
+        """Transcribes an in-memory voice message to text using Whisper API."""
         try:
-            file_size = voice_file.stat().st_size
-            if file_size > self.max_file_size:
+            if len(data) > self.max_file_size:
                 raise ValueError(
-                    f"Voice message is too large ({file_size/1024/1024:.1f}MB). "
+                    f"Voice message is too large ({len(data)/1024/1024:.1f}MB). "
                     f"Maximum size is {self.max_file_size/1024/1024:.1f}MB. "
                     "Please send a shorter message or compress it externally."
                 )
 
-            with open(voice_file, "rb") as audio:
-                response = await self.client.audio.transcriptions.create(
-                    model=self.model, file=audio, language=self.language
-                )
+            response = await self.client.audio.transcriptions.create(
+                model=self.model, file=(filename, data), language=self.language
+            )
             return response.text
 
         except Exception as e:
-            logger.error(f"Failed to transcribe voice message: {e}")
+            logger.error("Failed to transcribe voice message: %s", e)
             return None
 
-    async def text_to_speech(self, text: str) -> Optional[Path]:
+    async def text_to_speech(self, text: str) -> Optional[bytes]:
         """Converts text to speech using OpenAI TTS API."""
         try:
-            # Create temporary file for speech
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                speech_file = Path(tmp_file.name)
-
             response = await self.client.audio.speech.create(
                 model=config.voice.tts["model"],
                 voice=config.voice.tts["voice"],
                 input=text,
             )
-
-            await response.astream_to_file(speech_file)
-            return speech_file
+            return await response.aread()
 
         except Exception as e:
-            logger.error(f"Failed to convert text to speech: {e}")
+            logger.error("Failed to convert text to speech: %s", e)
             return None
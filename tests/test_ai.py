@@ -1,4 +1,6 @@
+import time
 import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from bot.ai import chat
 from bot.config import config
@@ -44,6 +46,16 @@ class ShortenTest(unittest.TestCase):
         shortened = chat.shorten(messages, length=10)
         self.assertEqual(shortened, messages)
 
+    def test_precomputed_lengths(self):
+        messages = [
+            {"role": "system", "content": "You are an AI assistant."},
+            {"role": "user", "content": "What is your name?"},
+            {"role": "assistant", "content": "My name is Alice."},
+            {"role": "user", "content": "Is it cold today?"},
+        ]
+        shortened = chat.shorten(messages, length=10, lengths=[1, 3, 3, 3])
+        self.assertEqual(shortened, messages)
+
     def test_remove_messages_1(self):
         messages = [
             {"role": "system", "content": "You are an AI assistant."},
@@ -90,3 +102,58 @@ class ShortenTest(unittest.TestCase):
                 {"role": "user", "content": "Is it cold today?"},
             ],
         )
+
+
+class CalcTokensTest(unittest.TestCase):
+    def setUp(self):
+        chat._count_tokens_cached.cache_clear()
+
+    def test_short(self):
+        self.assertEqual(chat._calc_tokens("one two three four five"), 6)
+        self.assertEqual(chat._count_tokens_cached.cache_info().currsize, 1)
+
+    def test_long(self):
+        text = "word " * chat.TOKENS_CACHE_MAX_LEN
+        self.assertEqual(chat._calc_tokens(text), int(chat.TOKENS_CACHE_MAX_LEN * 1.2))
+        # long texts are not kept in the cache
+        self.assertEqual(chat._count_tokens_cached.cache_info().currsize, 0)
+
+
+class FindWindowTest(unittest.TestCase):
+    def test_known(self):
+        self.assertEqual(chat._find_window("gpt-4"), 8192)
+
+    def test_dated_version(self):
+        self.assertEqual(chat._find_window("gpt-4-0613"), 8192)
+        self.assertEqual(chat._find_window("gpt-4o-mini-2024-07-18"), 128000)
+
+    def test_other_suffix(self):
+        # these have a larger window than gpt-4, so the configured one is used
+        self.assertIsNone(chat._find_window("gpt-4-1106-preview"))
+        self.assertIsNone(chat._find_window("gpt-4-0125-preview"))
+
+    def test_unknown(self):
+        self.assertIsNone(chat._find_window("llama"))
+
+
+class WarmupTest(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        chat.last_used = None
+
+    async def test_warmup(self):
+        client = MagicMock()
+        client.models.list = AsyncMock()
+        with patch.object(chat.openai, "with_options", return_value=client):
+            chat.last_used = None
+            await chat.warmup()
+            client.models.list.assert_called_once()
+
+            # the connection is still open, no need to warm it up again
+            await chat.warmup()
+            client.models.list.assert_called_once()
+
+    async def test_recently_used(self):
+        chat.last_used = time.monotonic()
+        with patch.object(chat.openai, "with_options") as with_options:
+            await chat.warmup()
+            with_options.assert_not_called()
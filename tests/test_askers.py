@@ -49,35 +49,18 @@ class ImagineAskerTest(unittest.IsolatedAsyncioTestCase):
         await asker.reply(message, context, answer="https://image.url")
         self.assertEqual(context.bot.text, "a cat: https://image.url")
 
-    def test_extract_size(self):
+    def test_parse(self):
         asker = ImagineAsker()
-        size = asker._extract_size(question="a cat 256x256")
-        self.assertEqual(size, "256x256")
-        size = asker._extract_size(question="a cat 512x512")
-        self.assertEqual(size, "512x512")
-        size = asker._extract_size(question="a cat 1024x1024")
-        self.assertEqual(size, "1024x1024")
-        size = asker._extract_size(question="a cat 256")
-        self.assertEqual(size, "256x256")
-        size = asker._extract_size(question="a cat 256px")
-        self.assertEqual(size, "256x256")
-        size = asker._extract_size(question="a cat 384")
-        self.assertEqual(size, "1024x1024")
-
-    def test_extract_caption(self):
+        self.assertEqual(asker._parse("a cat 256x256"), ("256x256", "a cat"))
+        self.assertEqual(asker._parse("a cat 512x512"), ("512x512", "a cat"))
+        self.assertEqual(asker._parse("a cat 1024x1024"), ("1024x1024", "a cat"))
+        self.assertEqual(asker._parse("a cat 256"), ("256x256", "a cat"))
+        self.assertEqual(asker._parse("a cat 256px"), ("256x256", "a cat"))
+        self.assertEqual(asker._parse("a cat 384"), ("1024x1024", "a cat 384"))
+
+    def test_parse_multiple_sizes(self):
         asker = ImagineAsker()
-        caption = asker._extract_caption(question="a cat 256x256")
-        self.assertEqual(caption, "a cat")
-        caption = asker._extract_caption(question="a cat 512x512")
-        self.assertEqual(caption, "a cat")
-        caption = asker._extract_caption(question="a cat 1024x1024")
-        self.assertEqual(caption, "a cat")
-        caption = asker._extract_caption(question="a cat 256")
-        self.assertEqual(caption, "a cat")
-        caption = asker._extract_caption(question="a cat 256px")
-        self.assertEqual(caption, "a cat")
-        caption = asker._extract_caption(question="a cat 384")
-        self.assertEqual(caption, "a cat 384")
+        self.assertEqual(asker._parse("a cat 256 on a 512 mat"), ("256x256", "a cat on a mat"))
 
 
 class CreateTest(unittest.TestCase):
@@ -1,18 +1,72 @@
+import asyncio
 import datetime as dt
 import unittest
+from unittest.mock import AsyncMock, patch
 
-from telegram import Chat, Message, MessageEntity, Update, User
+from telegram import Chat, Document, Message, MessageEntity, Update, User, Voice
 from telegram.constants import ChatType
 from telegram.ext import CallbackContext
 
 from bot import askers, bot
-from bot.batching import BatchProcessor
+from bot.batching import BatchProcessor, MarkItDownMessage
 from bot.filters import Filters
 from bot.config import config
-from tests.mocks import FakeApplication, FakeBot, FakeGPT
+from tests.mocks import FakeApplication, FakeBot, FakeFile, FakeGPT
 from tests.test_commands import Helper
 
 
+class FakeFileProcessor:
+    def __init__(self):
+        self.n_calls = 0
+
+    async def process_files(self, documents, photos):
+        self.n_calls += 1
+        return "file content"
+
+
+class MarkItDownMessageTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        MarkItDownMessage.cache.clear()
+        self.file_proc = FakeFileProcessor()
+        self.chat = Chat(id=1, type=ChatType.PRIVATE)
+
+    def tearDown(self):
+        MarkItDownMessage.cache.clear()
+
+    def _create_message(self, message_id: int, file_unique_id: str = "u1") -> Message:
+        doc = Document(
+            file_id=f"f{message_id}", file_unique_id=file_unique_id, file_name="file.txt"
+        )
+        return Message(message_id=message_id, date=dt.datetime.now(), chat=self.chat, document=doc)
+
+    async def test_cache(self):
+        msg = MarkItDownMessage(self._create_message(11), file_proc=self.file_proc)
+        await msg.process()
+        self.assertEqual(msg.content, "file content")
+
+        # the same file sent again is not processed twice
+        msg = MarkItDownMessage(self._create_message(12), file_proc=self.file_proc)
+        await msg.process()
+        self.assertEqual(msg.content, "file content")
+        self.assertEqual(self.file_proc.n_calls, 1)
+
+    async def test_cache_voice(self):
+        transcribe = AsyncMock(return_value="transcript")
+        with (
+            patch.object(Voice, "get_file", AsyncMock(return_value=FakeFile("v1"))),
+            patch("bot.batching.voice_processor.transcribe_bytes", transcribe),
+        ):
+            for message_id in (11, 12):
+                voice = Voice(file_id=f"v{message_id}", file_unique_id="v1", duration=1)
+                message = Message(
+                    message_id=message_id, date=dt.datetime.now(), chat=self.chat, voice=voice
+                )
+                msg = MarkItDownMessage(message, file_proc=self.file_proc)
+                await msg.process()
+                self.assertEqual(msg.content, "transcript")
+        transcribe.assert_called_once()
+
+
 class BatchMessageGroupTest(unittest.IsolatedAsyncioTestCase, Helper):
     def setUp(self):
         askers.TextAsker.model_factory = lambda name: FakeGPT()
@@ -30,7 +84,149 @@ class BatchMessageGroupTest(unittest.IsolatedAsyncioTestCase, Helper):
     async def test_no_mention_batch(self):
         update = self._create_update(11, text="What is your name?")
         await self.processor.add_message(update, update.message, self.context)
-        token = self.processor.tokens[update.effective_user.id]
-        await self.processor._finalize_batch(update.effective_user.id, token)
+        await asyncio.wait_for(self.processor.sweeper, timeout=1)
+        await asyncio.sleep(0.1)
         self.assertEqual(self.bot.text, "")
+        self.assertEqual(self.processor.batches, {})
+
+    async def test_new_batch_while_finalizing(self):
+        update = self._create_update(11, text="What is your name?")
+        await self.processor.add_message(update, update.message, self.context)
+        batch = self.processor.batches[update.effective_user.id]
+        batch.is_finalizing = True
+
+        update = self._create_update(12, text="And where are you from?")
+        await self.processor.add_message(update, update.message, self.context)
+        self.assertIsNot(self.processor.batches[update.effective_user.id], batch)
+        self.assertEqual(len(batch.messages), 1)
+
+    async def test_finalize_on_deadline(self):
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        update = self._create_update(11, text="@bot What is your name?", entities=(mention,))
+        await self.processor.add_message(update, update.message, self.context)
+        await asyncio.wait_for(self.processor.sweeper, timeout=1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.bot.text, "@bot What is your name?")
+        self.assertEqual(self.processor.deadlines, {})
+        self.assertEqual(self.processor.batches, {})
+
+    async def test_max_size(self):
+        self.processor.buffer_time = 10
+        self.processor.max_size = 2
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        update = self._create_update(11, text="@bot What is your name?", entities=(mention,))
+        await self.processor.add_message(update, update.message, self.context)
+        batch = self.processor.batches[update.effective_user.id]
+        update = self._create_update(12, text="And where are you from?")
+        await self.processor.add_message(update, update.message, self.context)
+        self.assertTrue(batch.is_finalizing)
+        self.assertEqual(self.processor.deadlines, {})
+
+        # the next message starts a new batch instead of joining the full one
+        update = self._create_update(13, text="Hello?")
+        await self.processor.add_message(update, update.message, self.context)
+        self.assertEqual(len(batch.messages), 2)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.bot.text, "@bot What is your name?\nAnd where are you from?")
+        self.processor.sweeper.cancel()
+
+    async def test_media(self):
+        MarkItDownMessage.cache.clear()
+
+        async def warmup():
+            await asyncio.sleep(1)
+
+        warmup_mock = AsyncMock(side_effect=warmup)
+        process_files = AsyncMock(return_value="file content")
+        with (
+            patch("bot.batching.ai.chat.warmup", warmup_mock),
+            patch("bot.batching.file_processor.process_files", process_files),
+        ):
+            mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+            for update_id in (11, 12):
+                doc = Document(
+                    file_id=f"f{update_id}", file_unique_id=f"u{update_id}", file_name="a.txt"
+                )
+                update = self._create_update(
+                    update_id,
+                    caption="@bot What is this?",
+                    caption_entities=(mention,),
+                    document=doc,
+                )
+                await self.processor.add_message(update, update.message, self.context)
+
+            # the reply does not wait for the warmup, which runs in the background
+            await asyncio.sleep(0.1)
+            self.assertEqual(
+                self.bot.text, "@bot What is this?\n\nfile content\n\nfile content"
+            )
+            self.assertFalse(self.processor.warming.done())
+            warmup_mock.assert_called_once()
+            self.processor.warming.cancel()
+
+    async def test_duplicate_text(self):
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        for update_id in (11, 12):
+            update = self._create_update(
+                update_id, text="@bot What is your name?", entities=(mention,)
+            )
+            await self.processor.add_message(update, update.message, self.context)
+        batch = self.processor.batches[update.effective_user.id]
+        self.assertEqual(len(batch.messages), 2)
+        self.assertEqual(batch.caption, "@bot What is your name?")
+        self.processor.sweeper.cancel()
+
+    async def test_repeated_text(self):
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        update = self._create_update(11, text="@bot Answer me", entities=(mention,))
+        await self.processor.add_message(update, update.message, self.context)
+        for update_id, text in ((12, "yes"), (13, "no"), (14, "yes")):
+            update = self._create_update(update_id, text=text)
+            await self.processor.add_message(update, update.message, self.context)
+        batch = self.processor.batches[update.effective_user.id]
+        # only consecutive duplicates are dropped
+        self.assertEqual(batch.caption, "@bot Answer me\nyes\nno\nyes")
+        self.processor.sweeper.cancel()
+
+    async def test_reply_order(self):
+        replies = []
+
+        async def reply_func(update, message, context, question, **kwargs):
+            # the first question takes longer to answer
+            await asyncio.sleep(0.1 if question == "@bot First" else 0)
+            replies.append(question)
+
+        processor = BatchProcessor(reply_func, buffer_time=0)
+        processor.max_size = 1
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        for update_id, text in ((11, "@bot First"), (12, "@bot Second")):
+            update = self._create_update(update_id, text=text, entities=(mention,))
+            await processor.add_message(update, update.message, self.context)
+        await asyncio.wait_for(processor.sending[update.effective_user.id], timeout=1)
+        await asyncio.sleep(0)
+        self.assertEqual(replies, ["@bot First", "@bot Second"])
+        self.assertEqual(processor.sending, {})
+
+    async def test_hold_while_sending(self):
+        replies = []
+
+        async def reply_func(update, message, context, question, **kwargs):
+            await asyncio.sleep(0.1 if question == "@bot First" else 0)
+            replies.append(question)
+
+        processor = BatchProcessor(reply_func, buffer_time=0)
+        mention = MessageEntity(type=MessageEntity.MENTION, offset=0, length=4)
+        update = self._create_update(11, text="@bot First", entities=(mention,))
+        await processor.add_message(update, update.message, self.context)
+        await asyncio.sleep(0.01)
+        self.assertIn(update.effective_user.id, processor.sending)
 
+        # messages arriving while the first answer is on its way are sent together
+        for update_id, text in ((12, "@bot Second"), (13, "@bot Third")):
+            update = self._create_update(update_id, text=text, entities=(mention,))
+            await processor.add_message(update, update.message, self.context)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        self.assertEqual(replies, ["@bot First", "@bot Second\n@bot Third"])
+        self.assertEqual(processor.sending, {})
+        self.assertEqual(processor.batches, {})
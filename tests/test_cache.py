@@ -0,0 +1,50 @@
+import time
+import unittest
+
+from bot.cache import TextCache
+
+
+class TextCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = TextCache(ttl=60, max_chars=10)
+
+    def test_get(self):
+        self.cache.set("a", "alice")
+        self.assertEqual(self.cache.get("a"), "alice")
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_expired(self):
+        self.cache.set("a", "alice")
+        self.cache.items["a"] = ("alice", time.monotonic() - 1)
+        self.assertIsNone(self.cache.get("a"))
+
+        # expired entries are evicted when a new one is added
+        self.cache.set("b", "bob")
+        self.assertEqual(list(self.cache.items), ["b"])
+        self.assertEqual(self.cache.n_chars, 3)
+
+    def test_max_chars(self):
+        self.cache.set("a", "alice")
+        self.cache.set("b", "bob")
+        self.cache.set("c", "cindy")
+        # the oldest entry is evicted to fit the newest one
+        self.assertEqual(list(self.cache.items), ["b", "c"])
+        self.assertEqual(self.cache.n_chars, 8)
+
+    def test_too_large(self):
+        self.cache.set("a", "alice")
+        self.cache.set("b", "x" * 11)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "alice")
+
+    def test_replace(self):
+        self.cache.set("a", "alice")
+        self.cache.set("a", "bob")
+        self.assertEqual(self.cache.get("a"), "bob")
+        self.assertEqual(self.cache.n_chars, 3)
+
+    def test_clear(self):
+        self.cache.set("a", "alice")
+        self.cache.clear()
+        self.assertEqual(self.cache.items, {})
+        self.assertEqual(self.cache.n_chars, 0)
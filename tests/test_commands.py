@@ -1,5 +1,7 @@
 import datetime as dt
+import time
 import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from telegram import Chat, Message, MessageEntity, Update, User
 from telegram.constants import ChatType
@@ -7,6 +9,7 @@ from telegram.ext import CallbackContext
 from telegram.ext import filters as tg_filters
 
 from bot import askers, bot, commands, models
+from bot.commands import error
 from bot.config import config
 from bot.filters import Filters
 from tests.mocks import FakeApplication, FakeBot, FakeDalle, FakeGPT
@@ -456,6 +459,13 @@ class MessageTest(unittest.IsolatedAsyncioTestCase, Helper):
         await self.command(update, self.context)
         self.assertEqual(self.bot.text, "I have so much to... (see attachment for the rest): 11.md")
 
+    async def test_last_file_content(self):
+        self.application.user_data[1] = {"last_file_content": "file content"}
+        update = self._create_update(11, text="What is this?")
+        await self.command(update, self.context)
+        self.assertEqual(self.ai.question, "What is this?\n\nfile content")
+        self.assertNotIn("last_file_content", self.application.user_data[1])
+
     async def test_exception(self):
         askers.TextAsker.model_factory = lambda name: FakeGPT(error=Exception("connection timeout"))
         update = self._create_update(11, text="What is your name?")
@@ -463,6 +473,15 @@ class MessageTest(unittest.IsolatedAsyncioTestCase, Helper):
         self.assertTrue(self.bot.text.startswith("⚠️ builtins.Exception:"))
         self.assertTrue("connection timeout" in self.bot.text)
 
+    async def test_long_exception(self):
+        error = Exception("connection timeout " * 20)
+        askers.TextAsker.model_factory = lambda name: FakeGPT(error=error)
+        update = self._create_update(11, text="What is your name?")
+        await self.command(update, self.context)
+        self.assertTrue(self.bot.text.startswith("⚠️ builtins.Exception: connection timeout"))
+        self.assertTrue(self.bot.text.endswith("timeout..."))
+        self.assertLessEqual(len(self.bot.text), 255)
+
 
 class MessageGroupTest(unittest.IsolatedAsyncioTestCase, Helper):
     def setUp(self):
@@ -579,3 +598,64 @@ class ErrorTest(unittest.IsolatedAsyncioTestCase, Helper):
         update._effective_chat = self.chat
         await command(update, self.context)
         self.assertEqual(self.bot.text, "⚠️ builtins.Exception: Something went wrong")
+
+    async def test_long_error(self):
+        self.context.error = Exception("Something went wrong " * 20)
+        command = commands.Error()
+        update = self._create_update(11, "Something went wrong")
+        update._effective_chat = self.chat
+        await command(update, self.context)
+        self.assertTrue(self.bot.text.startswith("⚠️ builtins.Exception: Something went wrong"))
+        self.assertTrue(self.bot.text.endswith("..."))
+        self.assertLessEqual(len(self.bot.text), 255)
+
+    def test_truncate(self):
+        self.assertEqual(error.truncate("short text"), "short text")
+        self.assertEqual(error.truncate("one two three", maxlen=10), "one two...")
+        # a single long word is cut in the middle
+        self.assertEqual(error.truncate("x" * 20, maxlen=10), "xxxxxxx...")
+
+
+class PreloadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_failed(self):
+        error = ImportError("no markitdown")
+        with patch.object(bot.file_processor, "preload", side_effect=error):
+            with self.assertLogs("bot.bot", level="ERROR") as logs:
+                await bot.preload_files()
+        self.assertIn("no markitdown", logs.output[0])
+
+
+class SendTypingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        bot.typing_sent.clear()
+
+    def tearDown(self):
+        bot.typing_sent.clear()
+
+    def _create_message(self, chat_id: int, thread_id: int = None) -> MagicMock:
+        message = MagicMock(chat_id=chat_id, message_thread_id=thread_id)
+        message.chat.send_action = AsyncMock()
+        return message
+
+    async def test_throttle(self):
+        message = self._create_message(1, thread_id=7)
+        await bot.send_typing(message)
+        await bot.send_typing(message)
+        message.chat.send_action.assert_called_once()
+
+        # other threads of the same chat are throttled separately
+        other = self._create_message(1, thread_id=8)
+        await bot.send_typing(other)
+        other.chat.send_action.assert_called_once()
+
+    async def test_prune(self):
+        stale = time.monotonic() - bot.TYPING_INTERVAL
+        bot.typing_sent.update({(chat_id, None): stale for chat_id in range(1001)})
+        message = self._create_message(2000)
+        await bot.send_typing(message)
+        self.assertEqual(bot.typing_sent.keys(), {(2000, None)})
+
+        # the pruned chat gets the typing action again
+        message = self._create_message(1)
+        await bot.send_typing(message)
+        message.chat.send_action.assert_called_once()
@@ -8,8 +8,10 @@ from bot.fetcher import Content, Fetcher
 class FakeClient:
     def __init__(self, responses: dict[str, Response | Exception]) -> None:
         self.responses = responses
+        self.n_calls = 0
 
     async def get(self, url: str) -> Response:
+        self.n_calls += 1
         value = self.responses[url]
         if isinstance(value, Exception):
             raise value
@@ -55,6 +57,27 @@ second
 ---""",
         )
 
+    async def test_cache(self):
+        resp = Response(status_code=200, headers={"content-type": "text/plain"}, text="first")
+        client = FakeClient({"https://example.org/first": resp})
+        self.fetcher.client = client
+        text_1 = await self.fetcher.substitute_urls("Explain https://example.org/first")
+        text_2 = await self.fetcher.substitute_urls("Explain https://example.org/first")
+        self.assertEqual(text_1, text_2)
+        self.assertEqual(client.n_calls, 1)
+
+        # the page is cached, not the question
+        text_3 = await self.fetcher.substitute_urls("Summarize https://example.org/first")
+        self.assertTrue(text_3.endswith("https://example.org/first contents:\n\nfirst\n---"))
+        self.assertEqual(client.n_calls, 1)
+
+    async def test_cache_failed(self):
+        client = FakeClient({"https://example.org/first": ValueError("boom")})
+        self.fetcher.client = client
+        await self.fetcher.substitute_urls("Explain https://example.org/first")
+        await self.fetcher.substitute_urls("Explain https://example.org/first")
+        self.assertEqual(client.n_calls, 2)
+
     async def test_ignore_quoted(self):
         src = "What is 'https://example.org/first'?"
         text = await self.fetcher.substitute_urls(src)
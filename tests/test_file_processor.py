@@ -11,9 +11,8 @@ from bot.file_processor import FileProcessor
 
 
 class _DummyFile:
-    async def download_to_drive(self, path, *args, **kwargs):
-        with open(path, "wb") as f:
-            f.write(b"data")
+    async def download_as_bytearray(self, *args, **kwargs):
+        return bytearray(b"data")
 
 
 class _DummyResult:
@@ -25,7 +24,7 @@ class FileProcessorTest(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.processor = FileProcessor()
         # patch markdown convert method
-        self.processor.md.convert = lambda *a, **kw: _DummyResult("text")
+        self.processor.md.convert_stream = lambda *a, **kw: _DummyResult("text")
         self.doc_patch = patch.object(Document, "get_file", AsyncMock(return_value=_DummyFile()))
         self.photo_patch = patch.object(PhotoSize, "get_file", AsyncMock(return_value=_DummyFile()))
         self.doc_patch.start()
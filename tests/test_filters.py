@@ -1,5 +1,7 @@
+import datetime as dt
 import unittest
 
+from telegram import Chat, Message, MessageEntity, Update, User
 from telegram.ext import filters as tg_filters
 
 from bot.config import config
@@ -23,11 +25,11 @@ class FiltersTest(unittest.TestCase):
         filters = Filters()
 
         config.telegram.usernames = ["alice", "bob", "cindy"]
-        config.telegram.chat_ids = [-300]
+        config.telegram.chat_ids = [-300, 400]
         config.telegram.admins = ["zappa", "xanos"]
         filters.reload()
         self.assertEqual(filters.users.usernames, set(["alice", "bob", "cindy"]))
-        self.assertEqual(filters.chats.chat_ids, set([-300]))
+        self.assertEqual(filters.chats.chat_ids, set([-300, -400]))
         self.assertEqual(filters.admins.usernames, set(["zappa", "xanos"]))
 
     def test_is_known_user(self):
@@ -36,6 +38,34 @@ class FiltersTest(unittest.TestCase):
         self.assertTrue(filters.is_known_user("alice"))
         self.assertFalse(filters.is_known_user("cindy"))
 
+    def test_incoming_messages(self):
+        config.telegram.usernames = ["alice"]
+        filters = Filters()
+        chat = Chat(id=1, type=Chat.PRIVATE)
+        alice = User(id=1, first_name="Alice", is_bot=False, username="alice")
+        bob = User(id=2, first_name="Bob", is_bot=False, username="bob")
+
+        message = Message(
+            message_id=11, date=dt.datetime.now(), chat=chat, from_user=alice, text="Hello"
+        )
+        self.assertTrue(filters.incoming_messages.check_update(Update(1, message=message)))
+
+        message = Message(
+            message_id=12, date=dt.datetime.now(), chat=chat, from_user=bob, text="Hello"
+        )
+        self.assertFalse(filters.incoming_messages.check_update(Update(2, message=message)))
+
+        command = MessageEntity(type=MessageEntity.BOT_COMMAND, offset=0, length=5)
+        message = Message(
+            message_id=13,
+            date=dt.datetime.now(),
+            chat=chat,
+            from_user=alice,
+            text="/help",
+            entities=(command,),
+        )
+        self.assertFalse(filters.incoming_messages.check_update(Update(3, message=message)))
+
 
 class EmptyTest(unittest.TestCase):
     def test_init(self):
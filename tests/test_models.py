@@ -44,6 +44,16 @@ class UserMessagesTest(unittest.TestCase):
         um = UserMessages(data, maxlen=3)
         self.assertEqual(um.messages, data["messages"])
 
+    def test_init_reuse(self):
+        data = {}
+        um_1 = UserMessages(data, maxlen=3)
+        um_2 = UserMessages(data, maxlen=3)
+        self.assertIs(um_1.messages, um_2.messages)
+
+        um_3 = UserMessages(data, maxlen=5)
+        self.assertIsNot(um_3.messages, um_1.messages)
+        self.assertEqual(um_3.messages.maxlen, 5)
+
     def test_last(self):
         um = UserMessages({}, maxlen=3)
         self.assertIsNone(um.last)
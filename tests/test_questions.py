@@ -1,5 +1,6 @@
 import datetime as dt
 import unittest
+from unittest.mock import AsyncMock
 
 from telegram import Chat, Document, Message, MessageEntity, User
 from telegram.constants import ChatType
@@ -39,6 +40,29 @@ class ExtractPrivateTest(unittest.IsolatedAsyncioTestCase):
         result = await questions.extract_private(message, self.context)
         self.assertEqual(result, "What is this?\n\nfile.txt:\n```\nfile content\n```")
 
+    async def test_document_encoding(self):
+        file = AsyncMock()
+        file.download_as_bytearray.return_value = bytearray(b"caf\xe9")
+        self.context.bot.get_file = AsyncMock(return_value=file)
+
+        # a declared text file keeps its readable part
+        document = Document(
+            file_id="f1", file_unique_id="f1", file_name="a.txt", mime_type="text/plain"
+        )
+        message = Message(
+            message_id=123, date=dt.datetime.now(), chat=self.chat, document=document
+        )
+        result = await questions.extract_private(message, self.context)
+        self.assertEqual(result, "\n\na.txt:\n```\ncaf\ufffd\n```")
+
+        # a file of unknown type that does not decode is skipped
+        document = Document(file_id="f2", file_unique_id="f2", file_name="a.bin")
+        message = Message(
+            message_id=124, date=dt.datetime.now(), chat=self.chat, document=document
+        )
+        result = await questions.extract_private(message, self.context)
+        self.assertEqual(result, "")
+
     async def test_reply(self):
         reply_message = Message(
             message_id=124, date=dt.datetime.now(), chat=self.chat, text="It is Paris."
@@ -145,6 +169,21 @@ class ExtractGroupTest(unittest.IsolatedAsyncioTestCase):
         result = await questions.extract_group(message, self.context)
         self.assertEqual(result, ("How are you ?", message))
 
+    async def test_multiple_mentions(self):
+        message = Message(
+            message_id=11,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            text="@bot ask @bob how he is",
+            entities=(
+                MessageEntity(type=MessageEntity.MENTION, offset=0, length=4),
+                MessageEntity(type=MessageEntity.MENTION, offset=9, length=4),
+            ),
+            reply_to_message=None,
+        )
+        result = await questions.extract_group(message, self.context)
+        self.assertEqual(result, ("ask  how he is", message))
+
     async def test_mention_other_user(self):
         message = Message(
             message_id=11,
@@ -190,6 +229,80 @@ class ExtractGroupTest(unittest.IsolatedAsyncioTestCase):
         result, _ = await questions.extract_group(message, self.context)
         self.assertEqual(result, "What is this?\n\nfile.txt:\n```\nfile content\n```")
 
+    async def test_document_no_mention(self):
+        self.bot.get_file = AsyncMock()
+        message = Message(
+            message_id=11,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            caption="What is this?",
+            document=Document(
+                file_id="f1234", file_unique_id="f1234", file_name="file.txt", file_size=1234
+            ),
+        )
+        result = await questions.extract_group(message, self.context)
+        self.assertEqual(result, ("", message))
+        self.bot.get_file.assert_not_called()
+
+    async def test_mention_binary_document(self):
+        self.bot.get_file = AsyncMock()
+        message = Message(
+            message_id=11,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            caption_entities=(MessageEntity(type=MessageEntity.MENTION, offset=0, length=4),),
+            caption="@bot What is this?",
+            document=Document(
+                file_id="f1234",
+                file_unique_id="f1234",
+                file_name="file.pdf",
+                mime_type="application/pdf",
+                file_size=1234,
+            ),
+        )
+        result, _ = await questions.extract_group(message, self.context)
+        self.assertEqual(result, "What is this?")
+        self.bot.get_file.assert_not_called()
+
+
+class ExtractPrevTest(unittest.TestCase):
+    def setUp(self):
+        self.chat = Chat(id=1, type=ChatType.GROUP)
+        self.bot = FakeBot("bot")
+        self.context = CallbackContext(FakeApplication(self.bot))
+
+    def _create_reply(self, prev_message: Message) -> Message:
+        return Message(
+            message_id=12,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            text="Is it?",
+            reply_to_message=prev_message,
+        )
+
+    def test_reply_to_bot(self):
+        bot_user = User(id=2, first_name="Bot", is_bot=True, username=self.bot.username)
+        bot_message = Message(
+            message_id=11,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            text="It's cold today.",
+            from_user=bot_user,
+        )
+        result = questions.extract_prev(self._create_reply(bot_message), self.context)
+        self.assertEqual(result, "It's cold today.")
+
+    def test_reply_without_sender(self):
+        # e.g. a reply to a channel post
+        channel_message = Message(
+            message_id=11,
+            date=dt.datetime.now(),
+            chat=self.chat,
+            text="It's cold today.",
+        )
+        result = questions.extract_prev(self._create_reply(channel_message), self.context)
+        self.assertEqual(result, "")
+
 
 class TestPrepare(unittest.TestCase):
     def test_ordinary(self):
@@ -202,6 +315,15 @@ class TestPrepare(unittest.TestCase):
         self.assertEqual(question, "How are you?")
         self.assertTrue(is_follow_up)
 
+    def test_follow_up_trailing_plus(self):
+        question, is_follow_up = questions.prepare("+ What is C++")
+        self.assertEqual(question, "What is C++")
+        self.assertTrue(is_follow_up)
+
+    def test_empty(self):
+        self.assertEqual(questions.prepare(""), ("", False))
+        self.assertEqual(questions.prepare("+"), ("", True))
+
     def test_shortcut(self):
         config.shortcuts["translate"] = "Translate into English."
         question, is_follow_up = questions.prepare("!translate Ciao")
@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.voice import VoiceProcessor
+
+
+class VoiceProcessorTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.processor = VoiceProcessor()
+        self.processor.client = MagicMock()
+
+    async def test_transcribe_bytes(self):
+        create = AsyncMock(return_value=MagicMock(text="Hello"))
+        self.processor.client.audio.transcriptions.create = create
+        text = await self.processor.transcribe_bytes(b"voice data")
+        self.assertEqual(text, "Hello")
+        self.assertEqual(create.call_args.kwargs["file"], ("voice.ogg", b"voice data"))
+
+    async def test_transcribe_too_large(self):
+        create = AsyncMock()
+        self.processor.client.audio.transcriptions.create = create
+        data = b"x" * (self.processor.max_file_size + 1)
+        text = await self.processor.transcribe_bytes(data)
+        self.assertIsNone(text)
+        create.assert_not_called()
+
+    async def test_text_to_speech(self):
+        response = MagicMock()
+        response.aread = AsyncMock(return_value=b"speech")
+        self.processor.client.audio.speech.create = AsyncMock(return_value=response)
+        speech = await self.processor.text_to_speech("Hello")
+        self.assertEqual(speech, b"speech")
+
+    async def test_text_to_speech_failed(self):
+        create = AsyncMock(side_effect=RuntimeError("boom"))
+        self.processor.client.audio.speech.create = create
+        speech = await self.processor.text_to_speech("Hello")
+        self.assertIsNone(speech)